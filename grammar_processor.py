@@ -1,14 +1,35 @@
-import re
-from collections import defaultdict, deque
+import bisect
+from collections import defaultdict
+import heapq
 from typing import Dict, List, Set, Tuple, Optional
 import itertools
 
+try:
+    from grammar_processor_numba import MAX_NON_TERMINALS, cyk_table, pack_rules
+except ImportError:  # numba and numpy are optional
+    cyk_table = None
+
+_INFINITY = float('inf')
+_DERIVES_CACHE_SIZE = 100_000
+_MAX_DFA_STATES = 4096
+
+def _mask_indices(mask: int):
+    """Yield the indices of the bits set in mask."""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
 class GrammarProcessor:
     def __init__(self):
         self.productions = defaultdict(list)  # Non-terminal -> list of productions
         self.terminals = set()
         self.non_terminals = set()
         self.start_symbol = None
+        # Sorted views of the symbol sets, kept in step by parse_grammar
+        self._sorted_terminals = []
+        self._sorted_non_terminals = []
+        self._finalize()
         
     def parse_grammar(self, grammar_text: str) -> None:
         """
@@ -31,73 +52,309 @@ class GrammarProcessor:
             if self.start_symbol is None:
                 self.start_symbol = left
             
-            self.non_terminals.add(left)
+            self._add_symbol(left, self.non_terminals, self._sorted_non_terminals)
             
             # Split productions by '|'
             productions = [prod.strip() for prod in right.split('|')]
             
+            self.productions[left].extend(productions)
+            
+            # Extract terminals and non-terminals once per distinct character
+            symbols = set(right)
+            for symbol in filter(str.isupper, symbols):
+                self._add_symbol(symbol, self.non_terminals, self._sorted_non_terminals)
+            for symbol in filter(str.islower, symbols):
+                self._add_symbol(symbol, self.terminals, self._sorted_terminals)
+        
+        self._finalize()
+    
+    @staticmethod
+    def _add_symbol(symbol: str, symbols: Set[str], sorted_symbols: List[str]) -> None:
+        """Add a symbol to a set and, if new, to its sorted view."""
+        if symbol not in symbols:
+            symbols.add(symbol)
+            bisect.insort(sorted_symbols, symbol)
+    
+    def _finalize(self) -> None:
+        """Rebuild the lookup structures derived from the parsed grammar."""
+        self._display_cache: Optional[str] = None
+        # Deleting every terminal leaves an empty string for valid words
+        self._terminal_table = str.maketrans('', '', ''.join(self.terminals))
+        # Substring -> mask of non-terminals deriving it, shared across queries.
+        # Only non-zero masks are kept so non-matching input does not fill it.
+        self._derives: Dict[str, int] = {}
+        self._compute_min_lengths()
+        self._compute_reachable_terminals()
+        self._compute_first_sets()
+        self._build_dfa()
+        self._to_cnf()
+    
+    def _build_dfa(self) -> None:
+        """
+        Compile a right-linear grammar (every production is a, aB or empty)
+        to a DFA by subset construction. self._dfa maps (state, terminal) to
+        the next state, with 0 as the start state; it stays None for grammars
+        that are not right-linear, or whose DFA would exceed _MAX_DFA_STATES
+        states (CYK handles those instead).
+        """
+        self._dfa: Optional[Dict[Tuple[int, str], int]] = None
+        self._dfa_accepting: Set[int] = set()
+        
+        if not self.start_symbol:
+            return
+        
+        # NFA moves: (non-terminal, terminal) -> next non-terminals, None meaning accept.
+        # Left-side symbols count as non-terminals even if lowercase, as in the CNF conversion.
+        terminals = self.terminals - self.non_terminals
+        moves = defaultdict(set)
+        for nt, productions in self.productions.items():
+            for prod in productions:
+                if len(prod) == 1 and prod in terminals:
+                    moves[nt, prod].add(None)
+                elif len(prod) == 2 and prod[0] in terminals and prod[1] in self.non_terminals:
+                    moves[nt, prod[0]].add(prod[1])
+                elif prod:
+                    return
+        
+        nullable = {nt for nt, length in self._min_len.items() if length == 0}
+        start = frozenset([self.start_symbol])
+        state_ids = {start: 0}
+        worklist = [start]
+        dfa = {}
+        
+        while worklist:
+            state = worklist.pop()
+            state_id = state_ids[state]
+            if None in state or not nullable.isdisjoint(state):
+                self._dfa_accepting.add(state_id)
+            
+            for terminal in terminals:
+                target = frozenset().union(*(moves.get((nt, terminal), ()) for nt in state))
+                if not target:
+                    continue
+                if target not in state_ids:
+                    # Subset construction can blow up exponentially; give up and keep CYK
+                    if len(state_ids) >= _MAX_DFA_STATES:
+                        self._dfa_accepting = set()
+                        return
+                    state_ids[target] = len(state_ids)
+                    worklist.append(target)
+                dfa[state_id, terminal] = state_ids[target]
+        
+        self._dfa = dfa
+    
+    def _compute_min_lengths(self) -> None:
+        """
+        Compute the length of the shortest terminal string each non-terminal
+        derives (infinite if it derives none), by relaxing until stable.
+        A symbol that is both a rule's left side and a terminal counts as a
+        non-terminal, as in the CNF conversion.
+        """
+        min_len = dict.fromkeys(self.non_terminals, _INFINITY)
+        changed = True
+        while changed:
+            changed = False
+            for nt, productions in self.productions.items():
+                for prod in productions:
+                    length = sum(min_len[char] if char in min_len
+                                 else 1 if char in self.terminals else _INFINITY
+                                 for char in prod)
+                    if length < min_len[nt]:
+                        min_len[nt] = length
+                        changed = True
+        
+        self._min_len = min_len
+    
+    def _compute_reachable_terminals(self) -> None:
+        """Compute the set of terminals that can appear in words derived from each non-terminal."""
+        reachable = {nt: set() for nt in self.non_terminals}
+        changed = True
+        while changed:
+            changed = False
+            for nt, productions in self.productions.items():
+                before = len(reachable[nt])
+                for prod in productions:
+                    for char in prod:
+                        if char in reachable:
+                            reachable[nt] |= reachable[char]
+                        elif char in self.terminals:
+                            reachable[nt].add(char)
+                if len(reachable[nt]) != before:
+                    changed = True
+        
+        self._reachable_terminals = reachable
+    
+    def _compute_first_sets(self) -> None:
+        """
+        Compute FIRST sets: the terminals that can begin a non-empty word
+        derived from each non-terminal. Relies on the minimum lengths to
+        know which non-terminals are nullable.
+        """
+        first = {nt: set() for nt in self.non_terminals}
+        changed = True
+        while changed:
+            changed = False
+            for nt, productions in self.productions.items():
+                before = len(first[nt])
+                for prod in productions:
+                    for char in prod:
+                        # Left-side symbols count as non-terminals even if lowercase
+                        if char not in first:
+                            if char in self.terminals:
+                                first[nt].add(char)
+                            break
+                        first[nt] |= first[char]
+                        # Look past the symbol only if it can vanish
+                        if self._min_len[char] != 0:
+                            break
+                if len(first[nt]) != before:
+                    changed = True
+        
+        self._first = first
+    
+    def _to_cnf(self) -> None:
+        """
+        Convert the grammar to Chomsky Normal Form for CYK recognition.
+        Every non-terminal gets an index so that sets of non-terminals can
+        be stored as int bitmasks; fresh non-terminals introduced while
+        binarizing are numbered after the original ones.
+        """
+        nt_index = {nt: i for i, nt in enumerate(self._sorted_non_terminals)}
+        count = len(nt_index)
+        terminal_nts = {}
+        rules = defaultdict(list)  # lhs index -> list of rhs tuples (int = non-terminal, str = terminal)
+        
+        for nt, productions in self.productions.items():
             for prod in productions:
-                self.productions[left].append(prod)
+                # Symbols that are neither terminals nor non-terminals can never be derived
+                if not all(char in self.terminals or char in nt_index for char in prod):
+                    continue
+                
+                # A symbol that is both a left side and a terminal counts as a non-terminal
+                rhs = [nt_index.get(char, char) for char in prod]
                 
-                # Extract terminals and non-terminals from production
-                for char in prod:
-                    if char.isupper():
-                        self.non_terminals.add(char)
-                    elif char.islower():
-                        self.terminals.add(char)
+                # Replace terminals inside long productions with T -> a
+                if len(rhs) > 1:
+                    for i, symbol in enumerate(rhs):
+                        if isinstance(symbol, str):
+                            if symbol not in terminal_nts:
+                                terminal_nts[symbol] = count
+                                rules[count].append((symbol,))
+                                count += 1
+                            rhs[i] = terminal_nts[symbol]
+                
+                # Binarize: A -> X1 X2 X3 becomes A -> X1 N, N -> X2 X3
+                lhs = nt_index[nt]
+                while len(rhs) > 2:
+                    rules[lhs].append((rhs[0], count))
+                    lhs = count
+                    count += 1
+                    rhs = rhs[1:]
+                rules[lhs].append(tuple(rhs))
+        
+        # Nullable non-terminals (fixed point)
+        nullable = set()
+        changed = True
+        while changed:
+            changed = False
+            for lhs, productions in rules.items():
+                if lhs not in nullable and any(all(s in nullable for s in rhs) for rhs in productions):
+                    nullable.add(lhs)
+                    changed = True
+        
+        # Remove epsilon productions: A -> BC also yields A -> B / A -> C
+        for lhs, productions in rules.items():
+            expanded = []
+            for rhs in productions:
+                if len(rhs) == 2:
+                    if rhs[1] in nullable:
+                        expanded.append(rhs[:1])
+                    if rhs[0] in nullable:
+                        expanded.append(rhs[1:])
+                if rhs:
+                    expanded.append(rhs)
+            rules[lhs] = expanded
+        
+        # Remove unit productions by following A -> B chains
+        unit_rules = defaultdict(int)  # terminal -> mask of A with A -> a
+        binary_rules = defaultdict(int)  # (B, C) -> mask of A with A -> BC
+        for a in range(count):
+            reachable = {a}
+            stack = [a]
+            while stack:
+                current = stack.pop()
+                for rhs in rules.get(current, ()):
+                    if len(rhs) == 1 and isinstance(rhs[0], int) and rhs[0] not in reachable:
+                        reachable.add(rhs[0])
+                        stack.append(rhs[0])
+            
+            a_bit = 1 << a
+            for b in reachable:
+                for rhs in rules.get(b, ()):
+                    if len(rhs) == 2:
+                        binary_rules[rhs] |= a_bit
+                    elif isinstance(rhs[0], str):
+                        unit_rules[rhs[0]] |= a_bit
+        
+        self._unit_rules = dict(unit_rules)
+        self._binary_rules = dict(binary_rules)
+        self._start_bit = 1 << nt_index[self.start_symbol] if self.start_symbol else 0
+        self._nt_count = count
+        
+        # Pack the rules for the numba kernel when the masks fit in a uint64
+        if cyk_table is not None and count <= MAX_NON_TERMINALS:
+            self._packed_rules = pack_rules(self._binary_rules)
+        else:
+            self._packed_rules = None
     
     def generate_words(self, max_length: int = 10, max_words: int = 100) -> List[str]:
         """
-        Generate words that the grammar can produce using BFS approach.
+        Generate words that the grammar can produce, shortest first.
+        Works bottom-up over the CNF grammar: the words of length l derived
+        from A are the joins of shorter words of B and C for each A -> BC.
         """
-        if not self.start_symbol:
+        if not self._start_bit or max_words <= 0 or max_length < 1:
             return []
         
-        generated_words = set()
-        queue = deque([self.start_symbol])
-        visited_strings = set([self.start_symbol])
+        # Nothing short enough can be derived
+        if self._min_len[self.start_symbol] > max_length:
+            return []
         
-        while queue and len(generated_words) < max_words:
-            current = queue.popleft()
-            
-            # If current string contains only terminals, it's a word
-            if self._is_terminal_string(current):
-                if len(current) <= max_length and current:
-                    generated_words.add(current)
-                continue
-            
-            # If string is too long, skip it
-            if len(current) > max_length:
-                continue
+        start = self._start_bit.bit_length() - 1
+        nt_count = self._nt_count
+        binary_rules = [(b, c, list(_mask_indices(a_mask))) for (b, c), a_mask in self._binary_rules.items()]
+        islice = itertools.islice
+        
+        # derived[l][A] holds the (at most max_words) smallest words of length l derived from A
+        level = [set() for _ in range(nt_count)]
+        for terminal, mask in self._unit_rules.items():
+            for a in _mask_indices(mask):
+                level[a].add(terminal)
+        derived = [None, [heapq.nsmallest(max_words, words) for words in level]]
+        generated_words = derived[1][start][:max_words]
+        
+        for length in range(2, max_length + 1):
+            if len(generated_words) >= max_words:
+                break
             
-            # Find all possible expansions
-            expansions = self._get_expansions(current)
+            level = [set() for _ in range(nt_count)]
+            for b, c, lhs in binary_rules:
+                joined = []
+                extend = joined.extend
+                for split in range(1, length):
+                    lefts = derived[split][b]
+                    rights = derived[length - split][c]
+                    if lefts and rights:
+                        # Same-length prefixes: the first pairs in order are the smallest joins
+                        extend(islice((left + right for left in lefts for right in rights), max_words))
+                if joined:
+                    for a in lhs:
+                        level[a].update(joined)
             
-            for expansion in expansions:
-                if expansion not in visited_strings and len(expansion) <= max_length * 2:
-                    visited_strings.add(expansion)
-                    queue.append(expansion)
+            derived.append([heapq.nsmallest(max_words, words) for words in level])
+            generated_words.extend(derived[length][start][:max_words - len(generated_words)])
         
-        return sorted(list(generated_words))
-    
-    def _is_terminal_string(self, s: str) -> bool:
-        """Check if string contains only terminal symbols."""
-        return all(char in self.terminals or char == '' for char in s)
-    
-    def _get_expansions(self, current: str) -> List[str]:
-        """Get all possible one-step expansions of current string."""
-        expansions = []
-        
-        # Find first non-terminal and expand it
-        for i, char in enumerate(current):
-            if char in self.non_terminals:
-                for production in self.productions[char]:
-                    # Replace the non-terminal with the production
-                    new_string = current[:i] + production + current[i+1:]
-                    expansions.append(new_string)
-                break  # Only expand the first non-terminal found
-        
-        return expansions
+        return sorted(generated_words)
     
     def belongs_to_grammar(self, word: str) -> bool:
         """
@@ -107,87 +364,118 @@ class GrammarProcessor:
             return self._can_produce_empty()
         
         # Check if word contains only valid terminals
-        if not all(char in self.terminals for char in word):
+        if word.translate(self._terminal_table):
+            return False
+        
+        # Reject words shorter than anything derivable, or using terminals
+        # that never appear in derivations from the start symbol
+        if not self.start_symbol or len(word) < self._min_len[self.start_symbol]:
+            return False
+        if not self._reachable_terminals[self.start_symbol].issuperset(word):
             return False
         
-        # Use BFS to check if word can be generated
-        return self._bfs_parse(word)
+        # Predictive check: the first character must be in FIRST(start)
+        if word[0] not in self._first[self.start_symbol]:
+            return False
+        
+        # Right-linear grammars are recognized by their DFA in linear time
+        if self._dfa is not None:
+            return self._dfa_parse(word)
+        
+        # Use CYK over the CNF form of the grammar
+        return self._cyk_parse(word)
+    
+    def _dfa_parse(self, target_word: str) -> bool:
+        """Run the DFA of a right-linear grammar over the target word."""
+        dfa = self._dfa
+        state = 0
+        for char in target_word:
+            state = dfa.get((state, char))
+            if state is None:
+                return False
+        
+        return state in self._dfa_accepting
     
     def _can_produce_empty(self) -> bool:
         """Check if grammar can produce empty string."""
-        # Simple check: see if any production leads to empty string
-        queue = deque([self.start_symbol])
-        visited = set([self.start_symbol])
-        
-        while queue:
-            current = queue.popleft()
-            
-            if current == '':
-                return True
-            
-            if self._is_terminal_string(current):
-                continue
-            
-            expansions = self._get_expansions(current)
-            for exp in expansions:
-                if exp not in visited and len(exp) < 20:  # Prevent infinite loops
-                    visited.add(exp)
-                    queue.append(exp)
-        
-        return False
+        # A non-terminal is nullable exactly when its shortest word is empty
+        return self._min_len.get(self.start_symbol, _INFINITY) == 0
     
-    def _bfs_parse(self, target_word: str) -> bool:
+    def _cyk_parse(self, target_word: str) -> bool:
         """
-        Use BFS to check if target word can be generated from start symbol.
+        Run CYK over the CNF grammar. table[i][l] is the bitmask of
+        non-terminals deriving the length-l substring starting at i.
         """
-        if not self.start_symbol:
+        if not self._start_bit:
             return False
         
-        queue = deque([self.start_symbol])
-        visited = set([self.start_symbol])
-        max_iterations = 10000  # Prevent infinite loops
-        iterations = 0
+        derives = self._derives
+        cached = derives.get(target_word)
+        if cached is not None:
+            return bool(self._start_bit & cached)
         
-        while queue and iterations < max_iterations:
-            iterations += 1
-            current = queue.popleft()
-            
-            # If we found the target word, return True
-            if current == target_word:
-                return True
-            
-            # If current string is terminal but not our target, skip
-            if self._is_terminal_string(current):
-                continue
-            
-            # If current string is longer than target, skip
-            if len(current) > len(target_word):
-                continue
-            
-            # Get all possible expansions
-            expansions = self._get_expansions(current)
-            
-            for expansion in expansions:
-                if expansion not in visited:
-                    visited.add(expansion)
-                    queue.append(expansion)
+        n = len(target_word)
+        unit_rules = self._unit_rules
+        base_masks = [unit_rules.get(char, 0) for char in target_word]
+        
+        if self._packed_rules is not None:
+            table = cyk_table(base_masks, self._packed_rules)
+            mask = int(table[0, n])
+            if mask and len(derives) < _DERIVES_CACHE_SIZE:
+                derives[target_word] = mask
+            return bool(self._start_bit & mask)
         
-        return False
+        # Flat (B, C, mask of A) triples bound to locals for the inner loop
+        binary_rules = [(b, c, a_mask) for (b, c), a_mask in self._binary_rules.items()]
+        table = [[0] * (n + 1) for _ in range(n)]
+        
+        for i, mask in enumerate(base_masks):
+            table[i][1] = mask
+        
+        for length in range(2, n + 1):
+            for i in range(n - length + 1):
+                row = table[i]
+                substring = target_word[i:i + length]
+                cached = derives.get(substring)
+                if cached is not None:
+                    row[length] = cached
+                    continue
+                
+                mask = 0
+                for split in range(1, length):
+                    left = row[split]
+                    if not left:
+                        continue
+                    right = table[i + split][length - split]
+                    if not right:
+                        continue
+                    for b, c, a_mask in binary_rules:
+                        if left >> b & 1 and right >> c & 1:
+                            mask |= a_mask
+                row[length] = mask
+                if mask and len(derives) < _DERIVES_CACHE_SIZE:
+                    derives[substring] = mask
+        
+        return bool(self._start_bit & table[0][n])
     
     def display_grammar(self) -> str:
         """Display the parsed grammar in a readable format."""
+        if self._display_cache is not None:
+            return self._display_cache
+        
         result = "Grammar Productions:\n"
         result += "=" * 20 + "\n"
         
-        for nt in sorted(self.non_terminals):
+        for nt in self._sorted_non_terminals:
             if nt in self.productions:
                 productions = " | ".join(self.productions[nt])
                 result += f"{nt} -> {productions}\n"
         
         result += f"\nStart Symbol: {self.start_symbol}\n"
-        result += f"Terminals: {{{', '.join(sorted(self.terminals))}}}\n"
-        result += f"Non-terminals: {{{', '.join(sorted(self.non_terminals))}}}\n"
+        result += f"Terminals: {{{', '.join(self._sorted_terminals)}}}\n"
+        result += f"Non-terminals: {{{', '.join(self._sorted_non_terminals)}}}\n"
         
+        self._display_cache = result
         return result
 
 def main():
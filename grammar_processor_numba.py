@@ -0,0 +1,63 @@
+"""
+Numba kernel for the CYK table fill used by grammar_processor.
+
+This module is optional: grammar_processor falls back to its pure Python
+loop when numba or numpy are not installed, or when the CNF grammar has
+more than MAX_NON_TERMINALS non-terminals and the masks no longer fit in
+a uint64.
+"""
+import numpy as np
+from numba import njit
+
+MAX_NON_TERMINALS = 64
+
+
+def pack_rules(binary_rules):
+    """
+    Pack CNF binary rules {(B, C): mask of A} into two uint64 arrays:
+    (B << 32) | C for each rule and the matching mask of A.
+    """
+    rules_bc_packed = np.empty(len(binary_rules), dtype=np.uint64)
+    rules_a_mask = np.empty(len(binary_rules), dtype=np.uint64)
+
+    for k, ((b, c), a_mask) in enumerate(binary_rules.items()):
+        rules_bc_packed[k] = (b << 32) | c
+        rules_a_mask[k] = a_mask
+
+    return rules_bc_packed, rules_a_mask
+
+
+@njit(cache=True)
+def cyk_fill(table, n, rules_bc_packed, rules_a_mask):
+    """
+    Fill table[i, l] for l >= 2, given the length-1 cells. Each cell is
+    the bitmask of non-terminals deriving the length-l substring at i.
+    """
+    one = np.uint64(1)
+    shift = np.uint64(32)
+    low_half = np.uint64(0xFFFFFFFF)
+
+    for length in range(2, n + 1):
+        for i in range(n - length + 1):
+            mask = np.uint64(0)
+            for split in range(1, length):
+                left = table[i, split]
+                right = table[i + split, length - split]
+                if left == 0 or right == 0:
+                    continue
+                for k in range(rules_bc_packed.shape[0]):
+                    packed = rules_bc_packed[k]
+                    if (left >> (packed >> shift)) & one and (right >> (packed & low_half)) & one:
+                        mask |= rules_a_mask[k]
+            table[i, length] = mask
+
+
+def cyk_table(base_masks, packed_rules):
+    """Build the CYK table for a word from the masks of its characters."""
+    n = len(base_masks)
+    table = np.zeros((n, n + 1), dtype=np.uint64)
+    for i, mask in enumerate(base_masks):
+        table[i, 1] = mask
+
+    cyk_fill(table, n, *packed_rules)
+    return table